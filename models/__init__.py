@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
 
 from . import support_appointment
-from . import appointment_settings
\ No newline at end of file
+from . import appointment_settings
+from . import helpdesk_stage
\ No newline at end of file
@@ -3,6 +3,9 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError
 
+# Monday to Friday, used when no working days are configured
+DEFAULT_WORKING_DAYS_MASK = 0b0011111
+
 
 class AppointmentSettings(models.Model):
     _name = 'support.appointment.settings'
@@ -18,7 +21,7 @@ class AppointmentSettings(models.Model):
         'res.users',
         string='Technician',
         help="Specific technician (leave empty for global settings)",
-        domain=[('groups_id', 'in', 'support_center.group_support_technician')]
+        domain=lambda self: [('groups_id', 'in', [self.env['support.appointment']._technician_group_id()])]
     )
     
     # Working hours configuration
@@ -37,6 +40,12 @@ class AppointmentSettings(models.Model):
         default='1,2,3,4,5',
         help="Comma-separated weekday numbers (1=Monday, 7=Sunday)"
     )
+    working_days_mask = fields.Integer(
+        string='Working Days Mask',
+        compute='_compute_working_days_mask',
+        store=True,
+        help="Bitmask of the working days (bit 0=Monday, bit 6=Sunday)"
+    )
     
     # Appointment constraints
     max_daily_appointments = fields.Integer(
@@ -72,16 +81,35 @@ class AppointmentSettings(models.Model):
         help="Automatically send 24-hour reminder emails"
     )
 
-    @api.constrains('working_hours_start', 'working_hours_end')
-    def _check_working_hours(self):
-        """Validate working hours are logical"""
+    # NULLs never collide in a UNIQUE constraint, so any number of global
+    # configurations (no technician) remain allowed
+    _sql_constraints = [
+        ('unique_technician', 'UNIQUE(technician_id)',
+         'A configuration already exists for this technician.'),
+        ('valid_working_hours',
+         'CHECK(working_hours_start >= 0 AND working_hours_end <= 24 '
+         'AND working_hours_start < working_hours_end)',
+         'Working hours must be between 0 and 24, with the end time after the start time.'),
+        ('positive_max_daily_appointments', 'CHECK(max_daily_appointments > 0)',
+         'Maximum daily appointments must be greater than 0'),
+        ('positive_advance_booking_days', 'CHECK(advance_booking_days > 0)',
+         'Advance booking days must be greater than 0'),
+    ]
+
+    @api.depends('working_days')
+    def _compute_working_days_mask(self):
+        """Parse working days once into a weekday bitmask"""
         for record in self:
-            if record.working_hours_start >= record.working_hours_end:
-                raise ValidationError(_("Working hours end time must be after start time"))
-            if record.working_hours_start < 0 or record.working_hours_start > 24:
-                raise ValidationError(_("Working hours start must be between 0 and 24"))
-            if record.working_hours_end < 0 or record.working_hours_end > 24:
-                raise ValidationError(_("Working hours end must be between 0 and 24"))
+            if not record.working_days:
+                record.working_days_mask = DEFAULT_WORKING_DAYS_MASK
+                continue
+            mask = 0
+            for day in record.working_days.split(','):
+                day = day.strip()
+                # Invalid values are reported by _check_working_days
+                if day.isdigit() and 1 <= int(day) <= 7:
+                    mask |= 1 << (int(day) - 1)
+            record.working_days_mask = mask
 
     @api.constrains('working_days')
     def _check_working_days(self):
@@ -95,29 +123,6 @@ class AppointmentSettings(models.Model):
                 except (ValueError, AttributeError):
                     raise ValidationError(_("Working days must be comma-separated numbers from 1-7 (1=Monday, 7=Sunday)"))
 
-    @api.constrains('max_daily_appointments', 'advance_booking_days')
-    def _check_positive_values(self):
-        """Ensure positive values for constraints"""
-        for record in self:
-            if record.max_daily_appointments <= 0:
-                raise ValidationError(_("Maximum daily appointments must be greater than 0"))
-            if record.advance_booking_days <= 0:
-                raise ValidationError(_("Advance booking days must be greater than 0"))
-
-    @api.constrains('technician_id')
-    def _check_unique_technician(self):
-        """Ensure only one configuration per technician"""
-        for record in self:
-            if record.technician_id:
-                existing = self.search([
-                    ('technician_id', '=', record.technician_id.id),
-                    ('id', '!=', record.id)
-                ])
-                if existing:
-                    raise ValidationError(_(
-                        "Configuration already exists for technician %s"
-                    ) % record.technician_id.name)
-
     @api.model
     def get_settings_for_technician(self, technician_id):
         """Get settings for a specific technician, fallback to global"""
@@ -160,7 +165,14 @@ class AppointmentSettings(models.Model):
         """Check if given date is a working day"""
         self.ensure_one()
         weekday = date.isoweekday()  # 1=Monday, 7=Sunday
-        return weekday in self.get_working_days_list()
+        return bool(self.working_days_mask & (1 << (weekday - 1)))
+
+    def working_mask(self, start_date, num_days):
+        """Return, for each of the num_days days from start_date, whether it is a working day"""
+        self.ensure_one()
+        mask = self.working_days_mask
+        first_weekday = start_date.weekday()  # 0=Monday, 6=Sunday
+        return [bool(mask >> ((first_weekday + offset) % 7) & 1) for offset in range(num_days)]
 
     def is_working_hour(self, time_float):
         """Check if given time (float hours) is within working hours"""
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, api
+
+
+class HelpdeskStage(models.Model):
+    _inherit = 'helpdesk.stage'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Invalidate the cached appointment status to stage mapping"""
+        stages = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return stages
+
+    def write(self, vals):
+        """Invalidate the cached appointment status to stage mapping"""
+        result = super().write(vals)
+        self.env.registry.clear_cache()
+        return result
+
+    def unlink(self):
+        """Invalidate the cached appointment status to stage mapping"""
+        result = super().unlink()
+        self.env.registry.clear_cache()
+        return result
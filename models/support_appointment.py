@@ -1,12 +1,71 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api, _
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import UserError, ValidationError
+from odoo.tools import SQL
 from datetime import datetime, timedelta
 import logging
+import math
 
 _logger = logging.getLogger(__name__)
 
+STATUS_SELECTION = [
+    ('draft', 'Draft'),
+    ('confirmed', 'Confirmed'),
+    ('in_progress', 'In Progress'),
+    ('completed', 'Completed'),
+    ('cancelled', 'Cancelled')
+]
+
+# Statuses of appointments occupying their technician's time
+ACTIVE_STATUSES = ('confirmed', 'in_progress')
+
+CANCELLATION_REASONS = [
+    ('customer_request', 'Customer Request'),
+    ('customer_unavailable', 'Customer Not Available'),
+    ('technician_unavailable', 'Technician Not Available'),
+    ('emergency', 'Emergency'),
+    ('equipment_issue', 'Equipment/Technical Issue'),
+    ('weather', 'Weather Conditions'),
+    ('rescheduled', 'Rescheduled to Different Time'),
+    ('duplicate', 'Duplicate Appointment'),
+    ('other', 'Other')
+]
+
+# Maximum number of conflicting appointments listed in edit warnings
+CONFLICT_WARNING_LIMIT = 5
+
+# Hourly slots offered per day by the slot search (8 AM to 5 PM)
+SLOTS_PER_DAY = 9
+
+# English day and month names used in slot labels
+DAY_NAMES = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+MONTH_NAMES = (
+    'January', 'February', 'March', 'April', 'May', 'June',
+    'July', 'August', 'September', 'October', 'November', 'December'
+)
+
+# Fields checked for technician conflicts by _check_appointment_validity
+SCHEDULE_FIELDS = ['scheduled_date', 'technician_id', 'duration']
+
+# Fields whose changes trigger side effects on write
+SIDE_EFFECT_FIELDS = ['status', 'technician_id', 'scheduled_date']
+
+# Fields returned by get_calendar_data() by default
+CALENDAR_FIELDS = [
+    'name', 'customer_id', 'technician_id',
+    'scheduled_date', 'end_datetime', 'status', 'priority'
+]
+
+# Helpdesk stage name fragment matching each appointment status
+TICKET_STAGE_BY_STATUS = {
+    'draft': 'new',
+    'confirmed': 'in_progress',
+    'in_progress': 'in_progress',
+    'completed': 'solved',
+    'cancelled': 'cancelled',
+}
+
 
 class SupportAppointment(models.Model):
     _name = 'support.appointment'
@@ -34,7 +93,7 @@ class SupportAppointment(models.Model):
         string='Technician', 
         required=True, 
         tracking=True,
-        domain=[('groups_id', 'in', 'support_center.group_support_technician')]
+        domain=lambda self: [('groups_id', 'in', [self._technician_group_id()])]
     )
     scheduled_date = fields.Datetime(
         string='Scheduled Date', 
@@ -44,15 +103,20 @@ class SupportAppointment(models.Model):
     duration = fields.Float(
         string='Duration (Hours)', 
         default=1.0,
+        tracking=True,
         help="Estimated duration in hours"
     )
-    status = fields.Selection([
-        ('draft', 'Draft'),
-        ('confirmed', 'Confirmed'),
-        ('in_progress', 'In Progress'),
-        ('completed', 'Completed'),
-        ('cancelled', 'Cancelled')
-    ], default='draft', tracking=True, string='Status')
+    status = fields.Selection(STATUS_SELECTION, default='draft', tracking=True, string='Status')
+    cancellation_reason = fields.Selection(
+        CANCELLATION_REASONS,
+        string='Cancellation Reason',
+        readonly=True,
+        index=True
+    )
+    cancellation_reason_details = fields.Text(
+        string='Cancellation Details',
+        readonly=True
+    )
     
     description = fields.Text(
         string='Description',
@@ -111,10 +175,44 @@ class SupportAppointment(models.Model):
         compute='_compute_end_datetime',
         store=True
     )
+    scheduled_day = fields.Date(
+        string='Scheduled Day',
+        compute='_compute_scheduled_day',
+        store=True
+    )
     
     # Archive field for cleanup
     active = fields.Boolean(default=True, help="Uncheck to archive this appointment")
 
+    _sql_constraints = [
+        ('duration_positive', 'CHECK(duration > 0)', 'Appointment duration must be greater than 0.'),
+    ]
+
+    def init(self):
+        """Create the indexes used by conflict checks and the reminder cron"""
+        # Rows without a valid range (NULL or non-positive duration) are left out:
+        # tsrange() treats a NULL bound as unbounded and raises on reversed bounds.
+        # Range queries repeat the end_datetime > scheduled_date condition.
+        tools.create_index(
+            self._cr, 'support_appointment_valid_range_idx', self._table,
+            ['tsrange(scheduled_date, end_datetime)'],
+            method='gist',
+            where="status IN ('confirmed', 'in_progress') AND end_datetime > scheduled_date",
+        )
+        tools.create_index(
+            self._cr, 'support_appointment_technician_time_active_idx', self._table,
+            ['technician_id', 'scheduled_date', 'end_datetime'],
+            where="status IN ('confirmed', 'in_progress')",
+        )
+        # Only covers appointments with a reminder requested. reminder_sent is left
+        # out of the predicate: the ORM renders "= False" as "IS NULL OR = false",
+        # which Postgres cannot match against a partial index condition.
+        tools.create_index(
+            self._cr, 'support_appointment_reminder_day_idx', self._table,
+            ['scheduled_day'],
+            where="send_reminder_email AND status IN ('confirmed', 'in_progress')",
+        )
+
     @api.depends('scheduled_date', 'duration')
     def _compute_end_datetime(self):
         """Compute end datetime based on start time and duration"""
@@ -124,143 +222,277 @@ class SupportAppointment(models.Model):
             else:
                 record.end_datetime = False
 
-    @api.model
-    def create(self, vals):
-        """Override create to auto-generate sequence and create ticket"""
-        if vals.get('name', 'New') == 'New':
-            vals['name'] = self.env['ir.sequence'].next_by_code('support.appointment') or 'New'
-        
-        # Auto-create helpdesk ticket if not provided
-        if not vals.get('helpdesk_ticket_id'):
-            ticket_vals = {
+    @api.depends('scheduled_date')
+    def _compute_scheduled_day(self):
+        """Compute the (UTC) day of the appointment, for date equality lookups"""
+        for record in self:
+            record.scheduled_day = record.scheduled_date.date() if record.scheduled_date else False
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Override create to auto-generate sequences and create tickets in batch"""
+        sequence = self.env['ir.sequence']
+        for vals in vals_list:
+            if vals.get('name', 'New') == 'New':
+                vals['name'] = sequence.next_by_code('support.appointment') or 'New'
+        
+        # Auto-create helpdesk tickets if not provided, in a single batch
+        vals_without_ticket = [vals for vals in vals_list if not vals.get('helpdesk_ticket_id')]
+        if vals_without_ticket:
+            tickets = self.env['helpdesk.ticket'].create([{
                 'name': f"Support Appointment: {vals.get('name', 'New')}",
                 'partner_id': vals.get('customer_id'),
                 'user_id': vals.get('technician_id'),
                 'description': vals.get('description', ''),
-            }
-            ticket = self.env['helpdesk.ticket'].create(ticket_vals)
-            vals['helpdesk_ticket_id'] = ticket.id
-            _logger.info(f"Auto-created helpdesk ticket {ticket.id} for appointment")
+            } for vals in vals_without_ticket])
+            for vals, ticket in zip(vals_without_ticket, tickets):
+                vals['helpdesk_ticket_id'] = ticket.id
+            _logger.info("Auto-created helpdesk tickets %s for appointments", tickets.ids)
             
-        appointment = super().create(vals)
+        appointments = super().create(vals_list)
         
-        # Send confirmation email if enabled
-        if appointment.send_confirmation_email:
+        # Send confirmation emails if enabled
+        for appointment in appointments.filtered('send_confirmation_email'):
             appointment._send_confirmation_email()
             
-        _logger.info(f"Appointment {appointment.name} created successfully")
-        return appointment
+        _logger.info("Appointments %s created successfully", appointments.mapped('name'))
+        return appointments
 
     def write(self, vals):
-        """Override write to track changes and handle validations"""
-        # Store old values for comparison
-        old_values = {}
-        for record in self:
-            old_values[record.id] = {
-                'status': record.status,
-                'technician_id': record.technician_id.id if record.technician_id else False,
-                'scheduled_date': record.scheduled_date,
-                'duration': record.duration,
-                'customer_id': record.customer_id.id if record.customer_id else False,
-            }
+        """Override write to trigger side effects of status and schedule changes"""
+        vals = self._drop_unchanged_schedule_vals(vals)
+        
+        # Store old values for comparison, reading only the relevant fields being written
+        changed_fields = [fname for fname in SIDE_EFFECT_FIELDS if fname in vals]
+        old_values = {values['id']: values for values in self.read(changed_fields, load=None)} if changed_fields else {}
         
         result = super().write(vals)
         
         # Process changes for each record
-        for record in self:
-            old_data = old_values[record.id]
-            record._process_appointment_changes(old_data, vals)
+        if old_values:
+            # Move the related tickets in one write per stage for the whole batch
+            if 'status' in vals:
+                self.filtered(lambda r: r.status != old_values[r.id]['status'])._update_ticket_status()
+            to_notify_ids = [
+                record.id for record in self
+                if record._process_appointment_changes(old_values[record.id], vals)
+            ]
+            # Send notifications for critical changes, batched for the whole write
+            self.browse(to_notify_ids)._notify_appointment_changes()
             
         return result
 
+    def _drop_unchanged_schedule_vals(self, vals):
+        """Return vals without the scheduling values every record already holds.
+
+        Writing them would be a no-op but still trigger the technician
+        conflict check of ``_check_appointment_validity``.
+        """
+        unchanged = [
+            fname for fname in SCHEDULE_FIELDS
+            if fname in vals and all(
+                record._fields[fname].convert_to_cache(record[fname], record)
+                == record._fields[fname].convert_to_cache(vals[fname], record)
+                for record in self
+            )
+        ]
+        if not unchanged:
+            return vals
+        return {fname: value for fname, value in vals.items() if fname not in unchanged}
+
     def _process_appointment_changes(self, old_values, new_vals):
-        """Process and log appointment changes"""
+        """Apply the side effects of appointment changes.
+
+        The changes themselves are logged to the chatter by mail tracking.
+
+        :param old_values: values of the record before the write, as returned by ``read(load=None)``
+        :return: whether critical details (date or technician) changed and should be notified
+        """
         self.ensure_one()
-        changes = []
         
-        # Track status changes
-        if 'status' in new_vals and new_vals['status'] != old_values['status']:
-            old_status_display = dict(self._fields['status'].selection)[old_values['status']]
-            new_status_display = dict(self._fields['status'].selection)[self.status]
-            changes.append(f"Status: {old_status_display} → {new_status_display}")
-            
-            # Update related helpdesk ticket status
-            self._update_ticket_status()
-            
-            _logger.info(f"Appointment {self.name} status changed: {old_values['status']} → {self.status}")
-        
-        # Track technician changes
-        if 'technician_id' in new_vals and new_vals['technician_id'] != old_values['technician_id']:
-            old_tech_name = self.env['res.users'].browse(old_values['technician_id']).name if old_values['technician_id'] else 'None'
-            new_tech_name = self.technician_id.name
-            changes.append(f"Technician: {old_tech_name} → {new_tech_name}")
-        
-        # Track scheduling changes
-        if 'scheduled_date' in new_vals and new_vals['scheduled_date'] != old_values['scheduled_date']:
-            old_date_str = old_values['scheduled_date'].strftime('%Y-%m-%d %H:%M') if old_values['scheduled_date'] else 'None'
-            new_date_str = self.scheduled_date.strftime('%Y-%m-%d %H:%M')
-            changes.append(f"Scheduled Date: {old_date_str} → {new_date_str}")
-        
-        # Track duration changes
-        if 'duration' in new_vals and new_vals['duration'] != old_values['duration']:
-            changes.append(f"Duration: {old_values['duration']}h → {self.duration}h")
-        
-        # Track customer changes
-        if 'customer_id' in new_vals and new_vals['customer_id'] != old_values['customer_id']:
-            old_customer_name = self.env['res.partner'].browse(old_values['customer_id']).name if old_values['customer_id'] else 'None'
-            new_customer_name = self.customer_id.name
-            changes.append(f"Customer: {old_customer_name} → {new_customer_name}")
-        
-        # Log changes to the chatter
-        if changes:
-            change_message = "Appointment updated:\n• " + "\n• ".join(changes)
-            self.message_post(body=change_message, message_type='comment')
-        
-        # Send notifications for critical changes
-        if 'scheduled_date' in new_vals or 'technician_id' in new_vals:
-            self._notify_appointment_changes()
+        # Related helpdesk tickets are updated by write() for the whole batch
+        if 'status' in new_vals and self.status != old_values['status']:
+            _logger.info("Appointment %s status changed: %s → %s", self.name, old_values['status'], self.status)
+        
+        return ('scheduled_date' in new_vals and self.scheduled_date != old_values['scheduled_date']) \
+            or ('technician_id' in new_vals and self.technician_id.id != old_values['technician_id'])
 
     def _notify_appointment_changes(self):
         """Send notifications when critical appointment details change"""
-        # Send notification to assigned technician
-        if self.technician_id:
-            self.message_post(
-                body=f"You have been assigned to appointment {self.name}",
-                partner_ids=[self.technician_id.partner_id.id],
-                message_type='notification'
+        # Notify each assigned technician once for all of their appointments
+        for technician in self.technician_id:
+            technician_appointments = self.filtered(lambda a: a.technician_id == technician)
+            self.env['support.appointment'].message_notify(
+                body=f"You have been assigned to appointments {', '.join(technician_appointments.mapped('name'))}",
+                partner_ids=technician.partner_id.ids
             )
         
         # Optional: Send email to customer about changes (if enabled)
-        if self.send_confirmation_email and self.status in ['confirmed', 'in_progress']:
-            template = self.env.ref('support_center.email_template_appointment_update', raise_if_not_found=False)
+        to_email = self.filtered(lambda a: a.send_confirmation_email and a.status in ACTIVE_STATUSES)
+        if to_email:
+            template = self._get_mail_template('support_center.email_template_appointment_update')
             if template:
-                template.send_mail(self.id, force_send=True)
+                for appointment in to_email:
+                    template.send_mail(appointment.id, force_send=True)
 
-    @api.constrains('scheduled_date', 'technician_id', 'duration')
+    @api.constrains(*SCHEDULE_FIELDS)
     def _check_appointment_validity(self):
         """Validate appointment constraints"""
+        now = fields.Datetime.now()
         for record in self:
             # Past date validation
-            if record.scheduled_date <= fields.Datetime.now():
+            if record.scheduled_date <= now:
                 raise ValidationError(_("Cannot schedule appointments in the past."))
-            
-            # Technician availability validation
-            conflicts = self.search([
-                ('technician_id', '=', record.technician_id.id),
-                ('scheduled_date', '<', record.end_datetime),
-                ('end_datetime', '>', record.scheduled_date),
-                ('status', 'in', ['confirmed', 'in_progress']),
-                ('id', '!=', record.id)
-            ])
-            if conflicts:
+        
+        # Technician availability validation, a single query for the whole batch
+        conflicts = self._get_conflicting_intervals()
+        for record in self:
+            if record.id in conflicts:
                 conflict_times = ', '.join([
-                    f"{c.scheduled_date.strftime('%Y-%m-%d %H:%M')} - {c.end_datetime.strftime('%H:%M')}"
-                    for c in conflicts
+                    f"{start.strftime('%Y-%m-%d %H:%M')} - {end.strftime('%H:%M')}"
+                    for start, end in conflicts[record.id]
                 ])
                 raise ValidationError(_(
                     "Technician %s has conflicting appointments at this time:\n%s"
                 ) % (record.technician_id.name, conflict_times))
 
+    def _get_conflicting_intervals(self):
+        """Return {appointment_id: [(start, end), ...]} of active appointments
+        overlapping each record of self for the same technician.
+
+        The batch is read back from the table after flushing, so records of
+        self are checked against each other as well as against existing
+        appointments, all in one query.
+        """
+        self.flush_model(['technician_id', 'scheduled_date', 'end_datetime', 'status', 'active'])
+        self.env.cr.execute("""
+            SELECT n.id, a.scheduled_date, a.end_datetime
+              FROM support_appointment n
+              JOIN support_appointment a
+                ON a.technician_id = n.technician_id
+               AND a.id != n.id
+               AND a.active
+               AND a.status IN %s
+               AND a.end_datetime > a.scheduled_date
+               AND n.end_datetime > n.scheduled_date
+               AND tsrange(a.scheduled_date, a.end_datetime) && tsrange(n.scheduled_date, n.end_datetime)
+             WHERE n.id = ANY(%s)
+          ORDER BY n.id, a.scheduled_date
+        """, [ACTIVE_STATUSES, self.ids])
+        conflicts = {}
+        for appointment_id, start, end in self.env.cr.fetchall():
+            conflicts.setdefault(appointment_id, []).append((start, end))
+        return conflicts
+
+    @api.model
+    def _conflict_domain(self, technician_id, start, stop, exclude_ids=()):
+        """Return the domain of the technician's active appointments overlapping [start, stop)"""
+        domain = [
+            ('technician_id', '=', technician_id),
+            ('scheduled_date', '<', stop),
+            ('end_datetime', '>', start),
+            ('status', 'in', ACTIVE_STATUSES),
+        ]
+        if exclude_ids:
+            domain.append(('id', 'not in', list(exclude_ids)))
+        return domain
+
+    @api.model
+    def _fetch_busy_intervals(self, technician_id, start, stop, exclude_ids=()):
+        """Return the (start, end) intervals of the technician's active
+        appointments overlapping [start, stop), ordered by start.
+        """
+        self.flush_model(['technician_id', 'scheduled_date', 'end_datetime', 'status', 'active'])
+        self.env.cr.execute("""
+            SELECT scheduled_date, end_datetime
+              FROM support_appointment
+             WHERE technician_id = %s
+               AND active
+               AND status IN %s
+               AND id != ALL(%s)
+               AND end_datetime > scheduled_date
+               AND tsrange(scheduled_date, end_datetime) && tsrange(%s, %s)
+          ORDER BY scheduled_date
+        """, [technician_id, ACTIVE_STATUSES, list(exclude_ids), start, stop])
+        return self.env.cr.fetchall()
+
+    @api.model
+    def _find_free_slots(self, technician_id, duration, exclude_ids=(), skip_slots=(), limit=5):
+        """Return up to ``limit`` free hourly slot starts (8 AM to 5 PM, within the
+        working days and hours of the technician's settings) over the next 7 days.
+
+        The slots of the week form a bitmask (bit ``day * 9 + hour - 8``):
+        every booking fetched for the window sets the bits of the slots it
+        overlaps, and the free slots are the lowest remaining business bits.
+        """
+        start_date = fields.Datetime.now().replace(hour=8, minute=0, second=0, microsecond=0)
+        duration = timedelta(hours=duration)
+        bookings = self._fetch_busy_intervals(
+            technician_id, start_date, start_date + timedelta(days=7) + duration, exclude_ids=exclude_ids
+        )
+        
+        settings = self.env['support.appointment.settings'].sudo().get_settings_for_technician(technician_id)
+        day_mask = 0
+        for slot in range(SLOTS_PER_DAY):
+            if settings.is_working_hour(start_date.hour + slot):
+                day_mask |= 1 << slot
+        business_mask = 0
+        for day_offset, is_working_day in enumerate(settings.working_mask(start_date, 7)):
+            if is_working_day:
+                business_mask |= day_mask << (day_offset * SLOTS_PER_DAY)
+        for slot_start in skip_slots:
+            slot_index = self._slot_index(start_date, slot_start)
+            if slot_index is not None:
+                business_mask &= ~(1 << slot_index)
+        
+        # Slot k of a day overlaps a booking when day + k hours < booking end
+        # and day + k hours + duration > booking start
+        busy_mask = 0
+        for booking_start, booking_end in bookings:
+            booking_end = booking_end or booking_start
+            first_day = max((booking_start - duration - start_date).days, 0)
+            last_day = min((booking_end - start_date).days, 6)
+            for day_offset in range(first_day, last_day + 1):
+                day = start_date + timedelta(days=day_offset)
+                first_slot = max(math.floor((booking_start - duration - day) / timedelta(hours=1)) + 1, 0)
+                last_slot = min(math.ceil((booking_end - day) / timedelta(hours=1)) - 1, SLOTS_PER_DAY - 1)
+                if first_slot <= last_slot:
+                    busy_mask |= ((1 << (last_slot - first_slot + 1)) - 1) << (day_offset * SLOTS_PER_DAY + first_slot)
+        
+        # Take the lowest free bits, earliest slots first
+        free_mask = business_mask & ~busy_mask
+        free_slots = []
+        while free_mask and len(free_slots) < limit:
+            lowest_bit = free_mask & -free_mask
+            slot_index = lowest_bit.bit_length() - 1
+            free_slots.append(start_date + timedelta(
+                days=slot_index // SLOTS_PER_DAY, hours=slot_index % SLOTS_PER_DAY
+            ))
+            free_mask ^= lowest_bit
+        return free_slots
+
+    @api.model
+    def _slot_display_name(self, slot_start):
+        """Return the label of a slot, e.g. 'Monday, March 02 at 09:00 AM'"""
+        return (
+            f"{DAY_NAMES[slot_start.weekday()]}, {MONTH_NAMES[slot_start.month - 1]} {slot_start.day:02d} "
+            f"at {slot_start.hour % 12 or 12:02d}:{slot_start.minute:02d} {'AM' if slot_start.hour < 12 else 'PM'}"
+        )
+
+    @api.model
+    def _slot_index(self, start_date, slot_start):
+        """Return the bit of ``slot_start`` in the slot mask of the week
+        starting at ``start_date``, or None if it is not on the hourly grid.
+        """
+        offset = slot_start - start_date
+        day_offset, slot = divmod(offset, timedelta(days=1))
+        if slot % timedelta(hours=1) or not 0 <= day_offset < 7:
+            return None
+        slot = slot // timedelta(hours=1)
+        if slot >= SLOTS_PER_DAY:
+            return None
+        return day_offset * SLOTS_PER_DAY + slot
+
     @api.constrains('technician_id')
     def _check_technician_group(self):
         """Ensure assigned user is a support technician"""
@@ -274,21 +506,18 @@ class SupportAppointment(models.Model):
         """Confirm appointment and update ticket status"""
         self.ensure_one()
         self.status = 'confirmed'
-        self._update_ticket_status()
         self.message_post(body=_("Appointment confirmed"))
         
     def action_start(self):
         """Start appointment work"""
         self.ensure_one()
         self.status = 'in_progress'
-        self._update_ticket_status()
         self.message_post(body=_("Appointment started"))
         
     def action_complete(self):
         """Complete appointment and close ticket"""
         self.ensure_one()
         self.status = 'completed'
-        self._update_ticket_status()
         self.message_post(body=_("Appointment completed"))
         
     def action_cancel(self):
@@ -309,7 +538,6 @@ class SupportAppointment(models.Model):
         """Direct cancellation without wizard (for simple cases)"""
         self.ensure_one()
         self.status = 'cancelled'
-        self._update_ticket_status()
         self.message_post(body=_("Appointment cancelled"))
         
     def action_reschedule(self):
@@ -386,16 +614,16 @@ class SupportAppointment(models.Model):
             
             end_datetime = new_date + timedelta(hours=new_duration)
             
-            conflicts = self.search([
-                ('technician_id', '=', new_technician),
-                ('scheduled_date', '<', end_datetime),
-                ('end_datetime', '>', new_date),
-                ('status', 'in', ['confirmed', 'in_progress']),
-                ('id', '!=', appointment_id)
-            ])
-            
+            conflicts = self.search(
+                self._conflict_domain(new_technician, new_date, end_datetime, exclude_ids=[appointment_id]),
+                limit=CONFLICT_WARNING_LIMIT + 1
+            )
+
             if conflicts:
-                conflict_names = ', '.join(conflicts.mapped('name'))
+                # One extra record is fetched only to know whether the list was cut
+                conflict_names = ', '.join(conflicts[:CONFLICT_WARNING_LIMIT].mapped('name'))
+                if len(conflicts) > CONFLICT_WARNING_LIMIT:
+                    conflict_names += ', …'
                 warnings.append(_(
                     "Scheduling conflict detected with appointments: %s"
                 ) % conflict_names)
@@ -404,63 +632,100 @@ class SupportAppointment(models.Model):
 
     def _update_ticket_status(self):
         """Update related helpdesk ticket status based on appointment status"""
-        if not self.helpdesk_ticket_id:
-            return
-            
-        ticket = self.helpdesk_ticket_id
-        status_mapping = {
-            'draft': 'new',
-            'confirmed': 'in_progress', 
-            'in_progress': 'in_progress',
-            'completed': 'solved',
-            'cancelled': 'cancelled'
-        }
-        
-        # Try to find the appropriate stage
-        stage_domain = [('name', 'ilike', status_mapping.get(self.status, 'new'))]
-        stages = self.env['helpdesk.stage'].search(stage_domain, limit=1)
-        
-        if stages:
-            ticket.stage_id = stages[0]
+        tickets_by_stage = {}
+        for appointment in self.filtered('helpdesk_ticket_id'):
+            stage_id = self._stage_id_for_status(appointment.status)
+            if stage_id:
+                tickets_by_stage.setdefault(stage_id, []).append(appointment.helpdesk_ticket_id.id)
+        
+        for stage_id, ticket_ids in tickets_by_stage.items():
+            self.env['helpdesk.ticket'].browse(ticket_ids).write({'stage_id': stage_id})
+
+    @tools.ormcache('status', 'self.env.lang')
+    def _stage_id_for_status(self, status):
+        """Return the id of the helpdesk stage matching an appointment status.
+
+        The result is cached until helpdesk stages are modified.
+        """
+        keyword = TICKET_STAGE_BY_STATUS.get(status, 'new')
+        return self.env['helpdesk.stage'].sudo().search([('name', 'ilike', keyword)], limit=1).id
+
+    @tools.ormcache()
+    def _technician_group_id(self):
+        """Return the id of the support technician group"""
+        return self.env.ref('support_center.group_support_technician').id
+
+    @tools.ormcache('xmlid')
+    def _template_id(self, xmlid):
+        """Return the id of the mail template with the given XML id, or False"""
+        template = self.env.ref(xmlid, raise_if_not_found=False)
+        return template.id if template else False
+
+    def _get_mail_template(self, xmlid):
+        """Return the mail template with the given XML id (empty if missing)"""
+        return self.env['mail.template'].browse(self._template_id(xmlid))
 
     def _send_confirmation_email(self):
         """Send confirmation email using Odoo's mail system"""
         if not self.confirmation_sent:
-            template = self.env.ref('support_center.email_template_appointment_confirmation', raise_if_not_found=False)
+            template = self._get_mail_template('support_center.email_template_appointment_confirmation')
             if template:
                 template.send_mail(self.id, force_send=True)
                 self.confirmation_sent = True
-                _logger.info(f"Confirmation email sent for appointment {self.name}")
+                _logger.info("Confirmation email sent for appointment %s", self.name)
 
     @api.model
     def get_calendar_data(self, domain=None, fields=None):
         """Get appointments for calendar view with proper security"""
-        if not domain:
-            domain = []
+        domain = list(domain or [])
             
         # Apply security: technicians see only their appointments
         if not self.env.user.has_group('support_center.group_support_manager'):
             domain.append(('technician_id', '=', self.env.user.id))
             
-        if not fields:
-            fields = [
-                'name', 'customer_id', 'technician_id', 
-                'scheduled_date', 'end_datetime', 'status', 'priority'
-            ]
-            
-        return self.search_read(domain, fields)
+        if fields:
+            return self.search_read(domain, fields)
+        
+        # Default calendar fields: read them in a single query joining the
+        # customer and technician names, shaped like search_read() results.
+        # _search() applies access rights and record rules to the domain.
+        query = self._search(domain)
+        self.flush_model(CALENDAR_FIELDS)
+        self.env['res.partner'].flush_model(['complete_name', 'name'])
+        self.env['res.users'].flush_model(['partner_id'])
+        self.env.cr.execute(SQL("""
+            SELECT a.id, a.name, a.customer_id, customer.complete_name,
+                   a.technician_id, technician.name,
+                   a.scheduled_date, a.end_datetime, a.status, a.priority
+              FROM support_appointment a
+         LEFT JOIN res_partner customer ON customer.id = a.customer_id
+         LEFT JOIN res_users u ON u.id = a.technician_id
+         LEFT JOIN res_partner technician ON technician.id = u.partner_id
+             WHERE a.id IN %s
+          ORDER BY a.scheduled_date DESC
+        """, query.subselect()))
+        return [{
+            'id': appointment_id,
+            'name': name,
+            'customer_id': (customer_id, customer_name) if customer_id else False,
+            'technician_id': (technician_id, technician_name) if technician_id else False,
+            'scheduled_date': scheduled_date or False,
+            'end_datetime': end_datetime or False,
+            'status': status or False,
+            'priority': priority or False,
+        } for (
+            appointment_id, name, customer_id, customer_name, technician_id, technician_name,
+            scheduled_date, end_datetime, status, priority,
+        ) in self.env.cr.fetchall()]
 
     @api.model
     def check_upcoming_reminders(self):
         """Cron job method to send 24-hour reminder emails"""
-        tomorrow = fields.Datetime.now() + timedelta(hours=24)
-        start_time = tomorrow.replace(hour=0, minute=0, second=0, microsecond=0)
-        end_time = start_time + timedelta(days=1)
+        tomorrow = (fields.Datetime.now() + timedelta(hours=24)).date()
         
         upcoming_appointments = self.search([
-            ('scheduled_date', '>=', start_time),
-            ('scheduled_date', '<', end_time),
-            ('status', 'in', ['confirmed', 'in_progress']),
+            ('scheduled_day', '=', tomorrow),
+            ('status', 'in', ACTIVE_STATUSES),
             ('send_reminder_email', '=', True),
             ('reminder_sent', '=', False)
         ])
@@ -470,27 +735,36 @@ class SupportAppointment(models.Model):
 
     def _send_reminder_email(self):
         """Send 24-hour reminder email"""
-        template = self.env.ref('support_center.email_template_appointment_reminder', raise_if_not_found=False)
+        template = self._get_mail_template('support_center.email_template_appointment_reminder')
         if template:
             template.send_mail(self.id, force_send=True)
             self.reminder_sent = True
-            _logger.info(f"Reminder email sent for appointment {self.name}")
+            _logger.info("Reminder email sent for appointment %s", self.name)
 
     @api.model
     def cleanup_old_appointments(self):
         """Optional cleanup method for old cancelled appointments (older than 6 months)"""
         cutoff_date = fields.Datetime.now() - timedelta(days=180)
-        old_cancelled = self.search([
-            ('status', '=', 'cancelled'),
-            ('scheduled_date', '<', cutoff_date)
-        ])
-        
-        if old_cancelled:
-            _logger.info(f"Cleaning up {len(old_cancelled)} old cancelled appointments")
-            # Archive instead of delete to preserve data integrity
-            old_cancelled.write({'active': False})
-        
-        return len(old_cancelled)
+        # Archive instead of delete to preserve data integrity. A single set-based
+        # UPDATE avoids loading and tracking every archived record through the ORM.
+        self.flush_model(['status', 'scheduled_date', 'active'])
+        self.env.cr.execute("""
+            UPDATE support_appointment
+               SET active = false,
+                   write_uid = %s,
+                   write_date = now() at time zone 'UTC'
+             WHERE status = 'cancelled'
+               AND scheduled_date < %s
+               AND active
+         RETURNING id
+        """, [self.env.uid, cutoff_date])
+        archived_ids = [row[0] for row in self.env.cr.fetchall()]
+        
+        if archived_ids:
+            self.invalidate_model(['active', 'write_uid', 'write_date'])
+            _logger.info("Cleaned up %s old cancelled appointments", len(archived_ids))
+        
+        return len(archived_ids)
 
     @api.model
     def generate_weekly_stats(self):
@@ -498,19 +772,19 @@ class SupportAppointment(models.Model):
         week_start = fields.Datetime.now() - timedelta(days=7)
         week_end = fields.Datetime.now()
         
-        appointments_this_week = self.search([
+        counts = dict(self._read_group([
             ('scheduled_date', '>=', week_start),
             ('scheduled_date', '<=', week_end)
-        ])
+        ], ['status'], ['__count']))
         
         stats = {
-            'total': len(appointments_this_week),
-            'completed': len(appointments_this_week.filtered(lambda a: a.status == 'completed')),
-            'cancelled': len(appointments_this_week.filtered(lambda a: a.status == 'cancelled')),
-            'in_progress': len(appointments_this_week.filtered(lambda a: a.status == 'in_progress')),
+            'total': sum(counts.values()),
+            'completed': counts.get('completed', 0),
+            'cancelled': counts.get('cancelled', 0),
+            'in_progress': counts.get('in_progress', 0),
         }
         
-        _logger.info(f"Weekly appointment stats: {stats}")
+        _logger.info("Weekly appointment stats: %s", stats)
         
         # Optional: Could send this to managers via email or create a report
         # For now, just log the statistics
@@ -1,8 +1,13 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api, _
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import ValidationError, UserError
 
+from ..models.support_appointment import CANCELLATION_REASONS, STATUS_SELECTION
+
+CANCELLATION_REASON_LABELS = dict(CANCELLATION_REASONS)
+STATUS_LABELS = dict(STATUS_SELECTION)
+
 
 class AppointmentCancel(models.TransientModel):
     _name = 'support.appointment.cancel'
@@ -11,9 +16,14 @@ class AppointmentCancel(models.TransientModel):
     appointment_id = fields.Many2one(
         'support.appointment',
         string='Appointment',
-        required=True,
         readonly=True
     )
+    appointment_ids = fields.Many2many(
+        'support.appointment',
+        string='Appointments',
+        readonly=True,
+        help="Appointments cancelled together from the list view"
+    )
     
     # Appointment details (readonly)
     customer_name = fields.Char(
@@ -37,17 +47,7 @@ class AppointmentCancel(models.TransientModel):
     )
     
     # Cancellation details
-    reason = fields.Selection([
-        ('customer_request', 'Customer Request'),
-        ('customer_unavailable', 'Customer Not Available'),
-        ('technician_unavailable', 'Technician Not Available'),
-        ('emergency', 'Emergency'),
-        ('equipment_issue', 'Equipment/Technical Issue'),
-        ('weather', 'Weather Conditions'),
-        ('rescheduled', 'Rescheduled to Different Time'),
-        ('duplicate', 'Duplicate Appointment'),
-        ('other', 'Other')
-    ], string='Cancellation Reason', required=True)
+    reason = fields.Selection(CANCELLATION_REASONS, string='Cancellation Reason', required=True)
     
     reason_details = fields.Text(
         string='Additional Details',
@@ -106,7 +106,9 @@ class AppointmentCancel(models.TransientModel):
         
         # Update appointment status
         self.appointment_id.write({
-            'status': 'cancelled'
+            'status': 'cancelled',
+            'cancellation_reason': self.reason,
+            'cancellation_reason_details': self.reason_details,
         })
         
         # Log cancellation details
@@ -152,6 +154,73 @@ class AppointmentCancel(models.TransientModel):
             }
         }
 
+    def action_cancel_appointments(self):
+        """Cancel all the appointments selected in the list view"""
+        self.ensure_one()
+        self.cancel_multi(
+            self.appointment_ids.ids, self.reason, self.reason_details,
+            notify_customer=self.notify_customer,
+            notify_technician=self.notify_technician,
+            refund_required=self.refund_required,
+            refund_notes=self.refund_notes,
+        )
+        return {'type': 'ir.actions.act_window_close'}
+
+    @api.model
+    def cancel_multi(self, appointment_ids, reason, reason_details=False,
+                     notify_customer=True, notify_technician=True,
+                     refund_required=False, refund_notes=False):
+        """Cancel several appointments at once, batching writes and notifications"""
+        appointments = self.env['support.appointment'].browse(appointment_ids)
+        self._validate_cancellation_batch(appointments)
+        
+        appointments.write({
+            'status': 'cancelled',
+            'cancellation_reason': reason,
+            'cancellation_reason_details': reason_details,
+        })
+        
+        reason_display = CANCELLATION_REASON_LABELS[reason]
+        
+        # Load the customer emails and technician partners of the whole batch up front
+        appointments.customer_id.fetch(['email'])
+        appointments.technician_id.fetch(['partner_id'])
+        
+        # Log cancellation details to every chatter at once
+        cancellation_message = f"Appointment cancelled.\n\nReason: {reason_display}"
+        if reason_details:
+            cancellation_message += f"\nDetails: {reason_details}"
+        if refund_required:
+            cancellation_message += "\nRefund Required: Yes"
+            if refund_notes:
+                cancellation_message += f"\nRefund Notes: {refund_notes}"
+        appointments._message_log_batch({appointment.id: cancellation_message for appointment in appointments})
+        
+        # Notify customers, rendering and queuing all emails in one batch
+        if notify_customer:
+            to_email = appointments.filtered(lambda a: a.customer_id.email)
+            template = appointments._get_mail_template('support_center.email_template_appointment_cancellation')
+            if template and to_email:
+                template.with_context(
+                    cancellation_reason=reason_display,
+                    cancellation_details=reason_details,
+                    refund_required=refund_required
+                ).send_mail_batch(to_email.ids)
+        
+        # Notify each technician once for all of their cancelled appointments
+        if notify_technician:
+            for technician in appointments.technician_id - self.env.user:
+                technician_appointments = appointments.filtered(lambda a: a.technician_id == technician)
+                self.env['support.appointment'].message_notify(
+                    body=f"Appointments {', '.join(technician_appointments.mapped('name'))} have been cancelled. Reason: {reason_display}",
+                    partner_ids=technician.partner_id.ids
+                )
+        
+        if refund_required:
+            self._create_refund_activities(appointments, refund_notes)
+        
+        return True
+
     def _validate_cancellation(self):
         """Validate that appointment can be cancelled"""
         appointment = self.appointment_id
@@ -175,11 +244,33 @@ class AppointmentCancel(models.TransientModel):
                 'Please contact the technician before cancelling.'
             ))
 
+    @api.model
+    def _validate_cancellation_batch(self, appointments):
+        """Validate that all appointments can be cancelled, reporting every offender at once"""
+        domain = [('id', 'in', appointments.ids)]
+        blocked_statuses = ['cancelled', 'completed', 'in_progress']
+        if self.env.user.has_group('support_center.group_support_manager'):
+            domain.append(('status', 'in', blocked_statuses))
+        else:
+            # Technicians can only cancel their own appointments
+            domain += ['|', ('status', 'in', blocked_statuses), ('technician_id', '!=', self.env.uid)]
+        
+        # Archived appointments (e.g. old cancelled ones) must be reported too
+        ineligible = self.env['support.appointment'].with_context(active_test=False).search(domain)
+        if ineligible:
+            raise ValidationError(_(
+                'The following appointments cannot be cancelled:\n%s'
+            ) % '\n'.join(
+                f"• {appointment.name}: "
+                + (STATUS_LABELS[appointment.status] if appointment.status in blocked_statuses else _('no permission'))
+                for appointment in ineligible
+            ))
+
     def _log_cancellation(self):
         """Log cancellation details to appointment chatter"""
         appointment = self.appointment_id
         
-        reason_display = dict(self._fields['reason'].selection)[self.reason]
+        reason_display = CANCELLATION_REASON_LABELS[self.reason]
         
         cancellation_message = f"Appointment cancelled.\n\nReason: {reason_display}"
         
@@ -191,30 +282,28 @@ class AppointmentCancel(models.TransientModel):
             if self.refund_notes:
                 cancellation_message += f"\nRefund Notes: {self.refund_notes}"
         
-        appointment.message_post(
-            body=cancellation_message,
-            message_type='comment'
-        )
+        appointment._message_log(body=cancellation_message)
 
     def _send_cancellation_notifications(self):
         """Send cancellation notifications"""
         appointment = self.appointment_id
+        reason_display = CANCELLATION_REASON_LABELS[self.reason]
         
         # Notify customer
         if self.notify_customer and appointment.customer_id.email:
-            template = self.env.ref('support_center.email_template_appointment_cancellation', raise_if_not_found=False)
+            template = appointment._get_mail_template('support_center.email_template_appointment_cancellation')
             if template:
                 ctx = {
-                    'cancellation_reason': dict(self._fields['reason'].selection)[self.reason],
+                    'cancellation_reason': reason_display,
                     'cancellation_details': self.reason_details,
                     'refund_required': self.refund_required
                 }
                 template.with_context(**ctx).send_mail(appointment.id, force_send=True)
         
-        # Notify technician
-        if self.notify_technician and appointment.technician_id:
+        # Notify technician (unless cancelling their own appointment)
+        if self.notify_technician and appointment.technician_id and appointment.technician_id != self.env.user:
             appointment.message_post(
-                body=f"Appointment {appointment.name} has been cancelled. Reason: {dict(self._fields['reason'].selection)[self.reason]}",
+                body=f"Appointment {appointment.name} has been cancelled. Reason: {reason_display}",
                 partner_ids=[appointment.technician_id.partner_id.id],
                 message_type='notification'
             )
@@ -223,21 +312,42 @@ class AppointmentCancel(models.TransientModel):
         """Process refund requirements (placeholder for integration with billing)"""
         # This method can be extended to integrate with billing systems
         # For now, just log the refund requirement
-        appointment = self.appointment_id
+        self._create_refund_activities(self.appointment_id, self.refund_notes)
+
+    @api.model
+    def _create_refund_activities(self, appointments, refund_notes=False):
+        """Create refund activities for the billing team (if exists), in one batch"""
+        billing_user_id = self._billing_user_id()
+        if not billing_user_id:
+            return
         
-        refund_message = f"Refund processing required for cancelled appointment {appointment.name}"
-        if self.refund_notes:
-            refund_message += f"\nNotes: {self.refund_notes}"
-        
-        # Create activity for billing team (if exists)
-        billing_users = self.env['res.users'].search([('groups_id.name', 'ilike', 'billing')])
-        if billing_users:
-            appointment.activity_schedule(
-                'mail.mail_activity_data_todo',
-                summary='Process refund for cancelled appointment',
-                note=refund_message,
-                user_id=billing_users[0].id
-            )
+        activity_type = self.env.ref('mail.mail_activity_data_todo')
+        res_model_id = self.env['ir.model']._get_id('support.appointment')
+        date_deadline = fields.Date.context_today(self)
+        
+        activity_vals_list = []
+        for appointment in appointments:
+            refund_message = f"Refund processing required for cancelled appointment {appointment.name}"
+            if refund_notes:
+                refund_message += f"\nNotes: {refund_notes}"
+            activity_vals_list.append({
+                'res_model_id': res_model_id,
+                'res_id': appointment.id,
+                'activity_type_id': activity_type.id,
+                'summary': 'Process refund for cancelled appointment',
+                'note': refund_message,
+                'user_id': billing_user_id,
+                'date_deadline': date_deadline,
+            })
+        self.env['mail.activity'].create(activity_vals_list)
+
+    @tools.ormcache()
+    def _billing_user_id(self):
+        """Return the id of the user handling refunds (first billing group member)"""
+        billing_group = self.env['res.groups'].search([('name', 'ilike', 'billing')], limit=1)
+        if not billing_group:
+            return False
+        return self.env['res.users'].search([('groups_id', '=', billing_group.id)], limit=1).id
 
     @api.model
     def get_cancellation_stats(self, date_from=None, date_to=None):
@@ -249,21 +359,13 @@ class AppointmentCancel(models.TransientModel):
         if date_to:
             domain.append(('create_date', '<=', date_to))
         
-        cancelled_appointments = self.env['support.appointment'].search(domain)
-        
-        # Extract reasons from chatter messages (simplified)
-        reasons = {}
-        for appointment in cancelled_appointments:
-            # This is a simplified approach - in practice, you might want to 
-            # store the cancellation reason directly on the appointment
-            messages = appointment.message_ids.filtered(lambda m: 'cancelled' in m.body.lower())
-            if messages:
-                # Extract reason from the latest cancellation message
-                # This is a placeholder - implement based on your message format
-                reasons[appointment.id] = 'customer_request'  # Default
+        # Aggregate counts and ids in the same GROUP BY query, without loading the records
+        reason_groups = self.env['support.appointment']._read_group(
+            domain, ['cancellation_reason'], ['__count', 'id:array_agg']
+        )
         
         return {
-            'total_cancelled': len(cancelled_appointments),
-            'cancellation_reasons': reasons,
-            'appointments': cancelled_appointments.ids
+            'total_cancelled': sum(count for _reason, count, _ids in reason_groups),
+            'cancellation_reasons': {reason: count for reason, count, _ids in reason_groups},
+            'appointments': [appointment_id for _reason, _count, ids in reason_groups for appointment_id in ids]
         }
\ No newline at end of file
@@ -3,6 +3,7 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError, UserError
 from datetime import datetime, timedelta
+import json
 
 
 class AppointmentReschedule(models.TransientModel):
@@ -45,7 +46,7 @@ class AppointmentReschedule(models.TransientModel):
     new_technician_id = fields.Many2one(
         'res.users',
         string='New Technician',
-        domain=[('groups_id', 'in', 'support_center.group_support_technician')],
+        domain=lambda self: [('groups_id', 'in', [self.env['support.appointment']._technician_group_id()])],
         help="Leave empty to keep current technician"
     )
     duration = fields.Float(
@@ -80,6 +81,10 @@ class AppointmentReschedule(models.TransientModel):
         string='Conflict Details',
         readonly=True
     )
+    last_check_key = fields.Char(
+        string='Last Conflict Check',
+        help="Technician, date and duration the conflict fields were last computed for"
+    )
 
     @api.onchange('new_date', 'new_technician_id')
     def _onchange_check_conflicts(self):
@@ -89,27 +94,34 @@ class AppointmentReschedule(models.TransientModel):
 
     def _check_reschedule_conflicts(self):
         """Check for scheduling conflicts with the new time/technician"""
+        # Determine which technician to check
+        check_technician = self.new_technician_id or self.current_technician
+        
+        # Skip the search when nothing changed since the last check
+        check_key = f"{check_technician.id}|{self.new_date.isoformat()}|{self.duration}"
+        if check_key == self.last_check_key:
+            return
+        self.last_check_key = check_key
+        
         self.conflicts_found = False
         self.conflict_details = False
         
-        # Determine which technician to check
-        check_technician = self.new_technician_id or self.current_technician
         if not check_technician:
             return
             
         end_datetime = self.new_date + timedelta(hours=self.duration)
         
         # Search for conflicting appointments
-        conflicts = self.env['support.appointment'].search([
-            ('technician_id', '=', check_technician.id),
-            ('scheduled_date', '<', end_datetime),
-            ('end_datetime', '>', self.new_date),
-            ('status', 'in', ['confirmed', 'in_progress']),
-            ('id', '!=', self.appointment_id.id)  # Exclude current appointment
-        ])
+        Appointment = self.env['support.appointment']
+        conflicts = Appointment.search(Appointment._conflict_domain(
+            check_technician.id, self.new_date, end_datetime,
+            exclude_ids=self.appointment_id.ids  # Exclude current appointment
+        ))
         
         if conflicts:
             self.conflicts_found = True
+            # Load all customer names in one query before formatting
+            conflicts.customer_id.mapped('name')
             conflict_list = []
             for conflict in conflicts:
                 conflict_list.append(
@@ -201,7 +213,9 @@ class AppointmentReschedule(models.TransientModel):
             'view_mode': 'form',
             'target': 'new',
             'context': {
-                'default_suggestions': suggestions,
+                'suggestions_json': json.dumps([
+                    [slot['datetime'].isoformat(), slot['display_name']] for slot in suggestions
+                ]),
                 'default_reschedule_wizard_id': self.id,
             }
         }
@@ -235,12 +249,13 @@ class AppointmentReschedule(models.TransientModel):
         
         # Notify customer if requested
         if self.notify_customer and appointment.customer_id.email:
-            template = self.env.ref('support_center.email_template_appointment_reschedule', raise_if_not_found=False)
+            template = appointment._get_mail_template('support_center.email_template_appointment_reschedule')
             if template:
                 template.with_context(reschedule_reason=self.reason).send_mail(appointment.id, force_send=True)
         
         # Notify new technician if changed
-        if self.notify_technician and self.new_technician_id and self.new_technician_id != self.current_technician:
+        if (self.notify_technician and self.new_technician_id
+                and self.new_technician_id not in (self.current_technician | self.env.user)):
             appointment.message_post(
                 body=f"You have been assigned to rescheduled appointment {appointment.name}",
                 partner_ids=[self.new_technician_id.partner_id.id],
@@ -249,44 +264,12 @@ class AppointmentReschedule(models.TransientModel):
 
     def _find_alternative_slots(self, technician):
         """Find alternative available time slots"""
-        slots = []
-        start_date = fields.Datetime.now().replace(hour=8, minute=0, second=0, microsecond=0)
-        
-        for day_offset in range(7):  # Check next 7 days
-            check_date = start_date + timedelta(days=day_offset)
-            
-            # Skip weekends (basic implementation)
-            if check_date.weekday() >= 5:
-                continue
-                
-            # Check hourly slots from 8 AM to 5 PM
-            for hour in range(8, 17):
-                slot_start = check_date.replace(hour=hour)
-                slot_end = slot_start + timedelta(hours=self.duration)
-                
-                # Skip the current appointment time
-                if (slot_start == self.current_date.replace(minute=0, second=0, microsecond=0)):
-                    continue
-                
-                # Check if slot is available
-                conflicts = self.env['support.appointment'].search_count([
-                    ('technician_id', '=', technician.id),
-                    ('scheduled_date', '<', slot_end),
-                    ('end_datetime', '>', slot_start),
-                    ('status', 'in', ['confirmed', 'in_progress']),
-                    ('id', '!=', self.appointment_id.id)
-                ])
-                
-                if not conflicts:
-                    slots.append({
-                        'datetime': slot_start,
-                        'display_name': slot_start.strftime('%A, %B %d at %I:%M %p')
-                    })
-                    
-                    if len(slots) >= 5:  # Limit to 5 suggestions
-                        break
-            
-            if len(slots) >= 5:
-                break
-        
-        return slots
\ No newline at end of file
+        # Skip the current appointment time
+        current_slot = self.current_date.replace(minute=0, second=0, microsecond=0)
+        free_slots = self.env['support.appointment']._find_free_slots(
+            technician.id, self.duration, exclude_ids=self.appointment_id.ids, skip_slots=[current_slot]
+        )
+        return [{
+            'datetime': slot_start,
+            'display_name': self.env['support.appointment']._slot_display_name(slot_start)
+        } for slot_start in free_slots]
\ No newline at end of file
@@ -2,6 +2,8 @@
 
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
+from datetime import datetime
+import json
 
 
 class AppointmentSuggestions(models.TransientModel):
@@ -26,8 +28,7 @@ class AppointmentSuggestions(models.TransientModel):
     @api.model
     def _get_time_suggestions(self):
         """Get available time suggestions from context"""
-        suggestions = self.env.context.get('default_suggestions', [])
-        return [(s['datetime'].isoformat(), s['display_name']) for s in suggestions]
+        return [tuple(suggestion) for suggestion in json.loads(self.env.context.get('suggestions_json', '[]'))]
 
     def action_select_time(self):
         """Apply selected time to the original wizard"""
@@ -35,14 +36,14 @@ class AppointmentSuggestions(models.TransientModel):
             raise UserError(_('Please select a time slot.'))
         
         # Update the original wizard with the selected time
-        selected_datetime = fields.Datetime.from_string(self.selected_datetime)
+        # Suggested slots were only offered when free, no need to check conflicts again
+        selected_datetime = datetime.fromisoformat(self.selected_datetime)
         self.wizard_id.write({
             'scheduled_date': selected_datetime,
+            'conflicts_found': False,
+            'conflict_message': False,
         })
         
-        # Trigger conflict check
-        self.wizard_id._onchange_check_conflicts()
-        
         # Return to the original wizard
         return {
             'type': 'ir.actions.act_window',
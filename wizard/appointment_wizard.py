@@ -3,8 +3,11 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError, UserError
 from datetime import datetime, timedelta
+import json
 import logging
 
+from ..models.support_appointment import ACTIVE_STATUSES
+
 _logger = logging.getLogger(__name__)
 
 
@@ -23,13 +26,12 @@ class AppointmentQuickCreateWizard(models.TransientModel):
         'res.users', 
         string='Technician', 
         required=True,
-        domain=[('groups_id', 'in', 'support_center.group_support_technician')],
+        domain=lambda self: [('groups_id', 'in', [self.env['support.appointment']._technician_group_id()])],
         help="Assign a technician for this appointment"
     )
     scheduled_date = fields.Datetime(
         string='Scheduled Date & Time', 
-        required=True,
-        default=lambda self: fields.Datetime.now() + timedelta(hours=1)
+        required=True
     )
     duration = fields.Float(
         string='Duration (Hours)', 
@@ -82,14 +84,39 @@ class AppointmentQuickCreateWizard(models.TransientModel):
         help="Optionally link to an existing helpdesk ticket"
     )
 
+    @api.model
+    def default_get(self, fields_list):
+        """Default the scheduled date to one hour from now, unless given in context"""
+        res = super().default_get(fields_list)
+        if 'scheduled_date' in fields_list and not res.get('scheduled_date'):
+            res['scheduled_date'] = fields.Datetime.now() + timedelta(hours=1)
+        return res
+
     @api.onchange('technician_id', 'scheduled_date', 'duration')
-    def _onchange_check_conflicts(self):
-        """Check for scheduling conflicts when key fields change"""
-        if self.technician_id and self.scheduled_date and self.duration:
-            self._check_technician_availability()
+    def _onchange_reset_conflicts(self):
+        """Clear conflict results of a previous check when key fields change"""
+        self.conflicts_found = False
+        self.conflict_message = False
 
-    def _check_technician_availability(self):
-        """Check if technician is available at the scheduled time"""
+    def action_check_conflicts(self):
+        """Check for scheduling conflicts and show the result in the wizard"""
+        self.ensure_one()
+        self._check_technician_availability()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Create Appointment'),
+            'res_model': 'support.appointment.wizard',
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+
+    def _check_technician_availability(self, format_details=True):
+        """Check if technician is available at the scheduled time
+
+        With ``format_details=False`` only the existence of a conflict is
+        checked and ``conflict_message`` is left empty.
+        """
         self.conflicts_found = False
         self.conflict_message = False
         
@@ -99,15 +126,18 @@ class AppointmentQuickCreateWizard(models.TransientModel):
         end_datetime = self.scheduled_date + timedelta(hours=self.duration)
         
         # Search for conflicting appointments
-        conflicts = self.env['support.appointment'].search([
-            ('technician_id', '=', self.technician_id.id),
-            ('scheduled_date', '<', end_datetime),
-            ('end_datetime', '>', self.scheduled_date),
-            ('status', 'in', ['confirmed', 'in_progress'])
-        ])
+        Appointment = self.env['support.appointment']
+        conflicts = Appointment.search(
+            Appointment._conflict_domain(self.technician_id.id, self.scheduled_date, end_datetime),
+            limit=None if format_details else 1
+        )
         
         if conflicts:
             self.conflicts_found = True
+            if not format_details:
+                return
+            # Load all customer names in one query before formatting
+            conflicts.customer_id.mapped('name')
             conflict_details = []
             for conflict in conflicts:
                 conflict_details.append(
@@ -132,14 +162,9 @@ class AppointmentQuickCreateWizard(models.TransientModel):
         """Prefill location from customer address when customer is selected"""
         if self.customer_id:
             # Use customer's address as default location
-            address_parts = []
-            if self.customer_id.street:
-                address_parts.append(self.customer_id.street)
-            if self.customer_id.street2:
-                address_parts.append(self.customer_id.street2)
-            if self.customer_id.city:
-                address_parts.append(self.customer_id.city)
-                
+            address = self.customer_id.read(['street', 'street2', 'city'])[0]
+            address_parts = [address[fname] for fname in ('street', 'street2', 'city') if address[fname]]
+            
             if address_parts:
                 self.location = ', '.join(address_parts)
 
@@ -158,14 +183,7 @@ class AppointmentQuickCreateWizard(models.TransientModel):
         """Create the appointment with validation"""
         self.ensure_one()
         
-        # Final validation before creation
-        self._validate_appointment_data()
-        
-        # Create appointment
-        appointment_vals = self._prepare_appointment_values()
-        appointment = self.env['support.appointment'].create(appointment_vals)
-        
-        _logger.info(f"Appointment {appointment.name} created via wizard by {self.env.user.name}")
+        appointment = self._create_appointment()
         
         # Return action to view the created appointment
         return {
@@ -186,7 +204,7 @@ class AppointmentQuickCreateWizard(models.TransientModel):
         self.ensure_one()
         
         # Create the appointment
-        self.action_create_appointment()
+        self._create_appointment()
         
         # Return new wizard with some fields pre-filled
         return {
@@ -204,16 +222,45 @@ class AppointmentQuickCreateWizard(models.TransientModel):
             }
         }
 
-    def _validate_appointment_data(self):
+    def _create_appointment(self):
+        """Validate the wizard data and create the appointment"""
+        # Serialize bookings per technician. Locking existing appointments would
+        # not stop a concurrent insert, so the technician row is touched instead:
+        # a concurrent booking for the same technician waits for this transaction,
+        # then fails with a serialization error and is retried by the server with
+        # a snapshot in which this appointment is visible to its conflict check.
+        self.env.cr.execute(
+            "UPDATE res_users SET write_date = write_date WHERE id = %s",
+            [self.technician_id.id]
+        )
+        
+        # Final validation before creation
+        now = fields.Datetime.now()
+        self._validate_appointment_data(now)
+        
+        # Create appointment
+        appointment_vals = self._prepare_appointment_values()
+        appointment = self.env['support.appointment'].create(appointment_vals)
+        
+        _logger.info("Appointment %s created via wizard by %s", appointment.name, self.env.user.login)
+        return appointment
+
+    def _validate_appointment_data(self, now=None):
         """Perform final validation before creating appointment"""
-        # Check for conflicts one more time
+        now = now or fields.Datetime.now()
+        
+        # Check for conflicts one more time, appointments may have been
+        # booked since the onchange check. The details are only formatted
+        # when there is something to report.
+        self._check_technician_availability(format_details=False)
         if self.conflicts_found:
+            self._check_technician_availability()
             raise ValidationError(_(
                 'Cannot create appointment due to scheduling conflicts:\n%s'
             ) % self.conflict_message)
         
         # Validate past date
-        if self.scheduled_date <= fields.Datetime.now():
+        if self.scheduled_date <= now:
             raise ValidationError(_('Cannot schedule appointments in the past.'))
         
         # Validate technician permissions
@@ -252,19 +299,31 @@ class AppointmentQuickCreateWizard(models.TransientModel):
     @api.model
     def get_available_technicians(self, date_start, date_end):
         """Get technicians available during the specified time period"""
-        all_technicians = self.env['res.users'].search([
-            ('groups_id', 'in', self.env.ref('support_center.group_support_technician').id)
-        ])
-        
-        # Find technicians with conflicts
-        busy_technicians = self.env['support.appointment'].search([
-            ('scheduled_date', '<', date_end),
-            ('end_datetime', '>', date_start),
-            ('status', 'in', ['confirmed', 'in_progress'])
-        ]).mapped('technician_id')
+        self.env['support.appointment'].flush_model(['technician_id', 'scheduled_date', 'end_datetime', 'status', 'active'])
+        self.env['res.users'].flush_model(['active', 'groups_id'])
         
-        # Return available technicians
-        return all_technicians - busy_technicians
+        # Technicians without any active appointment overlapping the period, in one query
+        self.env.cr.execute("""
+            SELECT u.id
+              FROM res_users u
+             WHERE u.active
+               AND EXISTS (
+                   SELECT 1
+                     FROM res_groups_users_rel r
+                    WHERE r.uid = u.id
+                      AND r.gid = %s
+               )
+               AND NOT EXISTS (
+                   SELECT 1
+                     FROM support_appointment a
+                    WHERE a.technician_id = u.id
+                      AND a.active
+                      AND a.status IN %s
+                      AND a.scheduled_date < %s
+                      AND a.end_datetime > %s
+               )
+        """, [self.env['support.appointment']._technician_group_id(), ACTIVE_STATUSES, date_end, date_start])
+        return self.env['res.users'].browse([row[0] for row in self.env.cr.fetchall()])
 
     def action_suggest_times(self):
         """Suggest alternative appointment times"""
@@ -286,46 +345,17 @@ class AppointmentQuickCreateWizard(models.TransientModel):
             'view_mode': 'form',
             'target': 'new',
             'context': {
-                'default_suggestions': suggestions,
+                'suggestions_json': json.dumps([
+                    [slot['datetime'].isoformat(), slot['display_name']] for slot in suggestions
+                ]),
                 'default_wizard_id': self.id,
             }
         }
 
     def _find_available_slots(self):
         """Find available time slots for the technician"""
-        slots = []
-        start_date = fields.Datetime.now().replace(hour=8, minute=0, second=0, microsecond=0)
-        
-        for day_offset in range(7):  # Check next 7 days
-            check_date = start_date + timedelta(days=day_offset)
-            
-            # Skip weekends (basic implementation)
-            if check_date.weekday() >= 5:
-                continue
-                
-            # Check hourly slots from 8 AM to 5 PM
-            for hour in range(8, 17):
-                slot_start = check_date.replace(hour=hour)
-                slot_end = slot_start + timedelta(hours=self.duration)
-                
-                # Check if slot is available
-                conflicts = self.env['support.appointment'].search_count([
-                    ('technician_id', '=', self.technician_id.id),
-                    ('scheduled_date', '<', slot_end),
-                    ('end_datetime', '>', slot_start),
-                    ('status', 'in', ['confirmed', 'in_progress'])
-                ])
-                
-                if not conflicts:
-                    slots.append({
-                        'datetime': slot_start,
-                        'display_name': slot_start.strftime('%A, %B %d at %I:%M %p')
-                    })
-                    
-                    if len(slots) >= 5:  # Limit to 5 suggestions
-                        break
-            
-            if len(slots) >= 5:
-                break
-        
-        return slots
\ No newline at end of file
+        free_slots = self.env['support.appointment']._find_free_slots(self.technician_id.id, self.duration)
+        return [{
+            'datetime': slot_start,
+            'display_name': self.env['support.appointment']._slot_display_name(slot_start)
+        } for slot_start in free_slots]
\ No newline at end of file